@@ -1,28 +1,60 @@
 import os
+import re
+import json
 import argparse
-from flask import Flask, request, jsonify, render_template_string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 
 from rag_engine import RAGEngine
 from llm_client import LLMClient
 from telemetry import TelemetryLogger
+from semantic_cache import SemanticCache
 
 load_dotenv()
 
 app = Flask(__name__)
 
 # Initialize components
-rag = RAGEngine()
+rag = RAGEngine(
+    model_name=os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'),
+    store_path=os.getenv('EMBEDDING_STORE', './cache/embeddings.db'),
+    precision=os.getenv('EMBEDDING_PRECISION', 'auto')
+)
 llm = LLMClient(
     host=os.getenv('OLLAMA_HOST', 'http://localhost:11434'),
-    model=os.getenv('OLLAMA_MODEL', 'llama3.2:3b')
+    model=os.getenv('OLLAMA_MODEL', 'llama3.2:3b'),
+    batch_host=os.getenv('LLM_BATCH_HOST'),
+    batch_model=os.getenv('LLM_BATCH_MODEL')
+)
+logger = TelemetryLogger(
+    log_dir=os.getenv('LOG_DIR', './logs'),
+    record_format=os.getenv('TELEMETRY_FORMAT', 'jsonl')
 )
-logger = TelemetryLogger(log_dir=os.getenv('LOG_DIR', './logs'))
+response_cache = SemanticCache(
+    threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.95)),
+    max_entries=int(os.getenv('SEMANTIC_CACHE_SIZE', 1024))
+)
+
+# Background work that overlaps the embedding stages of a request
+executor = ThreadPoolExecutor(max_workers=4)
 
 # Configuration
 MAX_INPUT_LENGTH = int(os.getenv('MAX_INPUT_LENGTH', 10000))
 TOP_K_CHUNKS = int(os.getenv('TOP_K_CHUNKS', 3))
 
+# Prompt injection patterns, compiled into one case-insensitive scan
+INJECTION_PATTERNS = [
+    'ignore previous instructions',
+    'disregard above',
+    'forget everything',
+    'you are now',
+    'new instructions:',
+    'ignore all previous',
+]
+_INJECTION_RE = re.compile('|'.join(map(re.escape, INJECTION_PATTERNS)), re.IGNORECASE)
+
 # HTML template for web interface
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -133,7 +165,70 @@ Photosynthesis is the process by which plants convert light energy into chemical
     </div>
     
     <script>
+        let controller = null;
+        
+        function renderQuiz(questions) {
+            let html = '';
+            questions.forEach((q, i) => {
+                html += `
+                    <div class="question">
+                        <h3>Question ${i+1}: ${q.question}</h3>
+                        <div class="hint"><strong>💡 Hint:</strong> ${q.hint}</div>
+                        <div class="rubric"><strong>📋 Rubric:</strong> ${q.rubric}</div>
+                    </div>
+                `;
+            });
+            return html;
+        }
+        
+        async function readStream(res, start, output) {
+            // Server sends one JSON event per line while the LLM generates
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let received = 0;
+            let firstToken = null;
+            let questions = [];
+            let result = {};
+            
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\\n');
+                buffer = lines.pop();
+                
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const event = JSON.parse(line);
+                    
+                    if (event.type === 'token') {
+                        if (firstToken === null) firstToken = Date.now() - start;
+                        received += event.text.length;
+                    } else if (event.type === 'question') {
+                        // Show each question as soon as it is complete
+                        questions[event.index] = event.question;
+                    } else {
+                        result = event;
+                        continue;
+                    }
+                    output.innerHTML = renderQuiz(questions.filter(Boolean)) +
+                        `<div class="loading"><div class="spinner"></div><p>Generating questions... ${received} characters (first token after ${firstToken}ms)</p></div>`;
+                }
+            }
+            
+            return result;
+        }
+        
         async function generate() {
+            // Clicking again while generating cancels the request
+            if (controller) {
+                controller.abort();
+                return;
+            }
+            
+
             const notes = document.getElementById('notes').value;
             const topic = document.getElementById('topic').value;
             const difficulty = document.getElementById('difficulty').value;
@@ -147,8 +242,8 @@ Photosynthesis is the process by which plants convert light energy into chemical
                 return;
             }
             
-            btn.disabled = true;
-            btn.textContent = 'Generating...';
+            controller = new AbortController();
+            btn.textContent = 'Cancel';
             stats.style.display = 'none';
             output.innerHTML = '<div class="loading"><div class="spinner"></div><p>Retrieving context and generating questions...</p></div>';
             
@@ -156,40 +251,37 @@ Photosynthesis is the process by which plants convert light energy into chemical
                 const start = Date.now();
                 const res = await fetch('/generate', {
                     method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ notes, topic, difficulty, num_questions: parseInt(num) })
+                    headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+                    body: JSON.stringify({ notes, topic, difficulty, num_questions: parseInt(num) }),
+                    signal: controller.signal
                 });
                 
-                const data = await res.json();
+                // Errors and cache hits come back as plain JSON
+                const streamed = (res.headers.get('Content-Type') || '').includes('application/x-ndjson');
+                const data = streamed ? await readStream(res, start, output) : await res.json();
                 
-                if (!res.ok) {
+                if (!res.ok || !data.questions) {
                     output.innerHTML = `<div class="error">${data.error || 'Generation failed'}</div>`;
                     return;
                 }
                 
                 // Display quiz
-                let html = '';
-                data.questions.forEach((q, i) => {
-                    html += `
-                        <div class="question">
-                            <h3>Question ${i+1}: ${q.question}</h3>
-                            <div class="hint"><strong>💡 Hint:</strong> ${q.hint}</div>
-                            <div class="rubric"><strong>📋 Rubric:</strong> ${q.rubric}</div>
-                        </div>
-                    `;
-                });
-                output.innerHTML = html;
+                output.innerHTML = renderQuiz(data.questions);
                 
                 // Show stats
                 stats.style.display = 'grid';
                 document.getElementById('latency').textContent = `${Date.now() - start}ms`;
-                document.getElementById('tokens').textContent = data.telemetry?.tokens || '~500';
-                document.getElementById('chunks').textContent = data.telemetry?.chunks || TOP_K_CHUNKS;
+                document.getElementById('tokens').textContent = data.telemetry?.cache_hit ? 'cached' : (data.telemetry?.tokens ?? '-');
+                document.getElementById('chunks').textContent = data.telemetry?.cache_hit ? 'cached' : (data.telemetry?.chunks ?? '-');
                 
             } catch (err) {
-                output.innerHTML = `<div class="error">Network error: ${err.message}</div>`;
+                if (err.name === 'AbortError') {
+                    output.innerHTML = '<div class="error">Generation cancelled.</div>';
+                } else {
+                    output.innerHTML = `<div class="error">Network error: ${err.message}</div>`;
+                }
             } finally {
-                btn.disabled = false;
+                controller = null;
                 btn.textContent = 'Generate Quiz';
             }
         }
@@ -205,6 +297,10 @@ Photosynthesis is the process by which plants convert light energy into chemical
 </html>
 """
 
+# The template has no Jinja variables, so it is served as-is without
+# re-parsing on every request
+INDEX_HEADERS = {'Cache-Control': 'public, max-age=300'}
+
 
 def validate_input(notes, topic):
     """Validate and sanitize inputs"""
@@ -215,19 +311,8 @@ def validate_input(notes, topic):
         return False, f"Notes too long. Maximum {MAX_INPUT_LENGTH} characters."
     
     # Check for prompt injection patterns
-    injection_patterns = [
-        'ignore previous instructions',
-        'disregard above',
-        'forget everything',
-        'you are now',
-        'new instructions:',
-        'ignore all previous',
-    ]
-    
-    combined = (notes + ' ' + topic).lower()
-    for pattern in injection_patterns:
-        if pattern in combined:
-            return False, "Invalid input detected. Please rephrase your request."
+    if _INJECTION_RE.search(notes) or _INJECTION_RE.search(topic):
+        return False, "Invalid input detected. Please rephrase your request."
     
     return True, None
 
@@ -235,7 +320,7 @@ def validate_input(notes, topic):
 @app.route('/')
 def index():
     """Serve web interface"""
-    return render_template_string(HTML_TEMPLATE)
+    return Response(HTML_TEMPLATE, mimetype='text/html', headers=INDEX_HEADERS)
 
 
 @app.route('/generate', methods=['POST'])
@@ -257,42 +342,70 @@ def generate_quiz():
             logger.log('RAG', 0, 'error', error=error)
             return jsonify({'error': error}), 400
         
-        # Build corpus and retrieve context
-        chunks = rag.chunk_text(notes)
-        rag.build_index(chunks)
+        # Load the LLM while we embed; nothing below waits on it
+        executor.submit(_warmup_llm)
         
+        # Build corpus (cached by content hash) and retrieve context. On a
+        # corpus cache miss the query and chunks are embedded in one batch.
         query = topic if topic else "generate quiz questions from notes"
-        context_chunks = rag.retrieve(query, k=TOP_K_CHUNKS)
+        context_chunks = rag.build_and_retrieve(notes, query, k=TOP_K_CHUNKS)
         context = "\n\n".join(context_chunks)
         
+        # Serve near-duplicate notes from the semantic cache, keyed on the
+        # mean chunk embedding so all of the notes count, not just what fits
+        # in one encode. It comes from the index built above, so it costs no
+        # encode of its own. The topic is part of the namespace: notes
+        # dominate the embedding, so a new topic on the same notes would
+        # otherwise still look like a hit. So is the chunk count, so notes
+        # that gained or lost material never match.
+        request_embedding, num_chunks = rag.notes_embedding(notes)
+        cache_key = (difficulty, num_questions, topic.strip().lower(), num_chunks)
+        cached_quiz = None
+        if request_embedding is not None:
+            cached_quiz = response_cache.get(request_embedding, namespace=cache_key)
+        if cached_quiz is not None:
+            latency_ms = int((time.time() - start_time) * 1000)
+            logger.log(pathway='cache', latency_ms=latency_ms, status='success')
+            return jsonify({
+                'questions': cached_quiz,
+                'telemetry': {
+                    'latency_ms': latency_ms,
+                    'chunks': 0,
+                    'tokens': 0,
+                    'cache_hit': True
+                }
+            })
+        
+        # Stream tokens as NDJSON when the client asks for it
+        if request.accept_mimetypes.best_match(
+            ['application/json', 'application/x-ndjson']
+        ) == 'application/x-ndjson':
+            events = llm.generate_quiz_stream(
+                context=context,
+                topic=topic,
+                difficulty=difficulty,
+                num_questions=num_questions
+            )
+            return Response(
+                stream_with_context(_stream_quiz(events, context_chunks, start_time,
+                                                 request_embedding, cache_key)),
+                mimetype='application/x-ndjson'
+            )
+        
         # Generate quiz with LLM
-        quiz = llm.generate_quiz(
+        quiz, usage = llm.generate_quiz(
             context=context,
             topic=topic,
             difficulty=difficulty,
             num_questions=num_questions
         )
         
-        # Calculate metrics
-        latency_ms = int((time.time() - start_time) * 1000)
-        
-        # Log telemetry
-        logger.log(
-            pathway='RAG',
-            latency_ms=latency_ms,
-            status='success',
-            tokens_input=len(context.split()) * 1.3,  # Rough estimate
-            tokens_output=len(str(quiz).split()) * 1.3,
-            chunks_retrieved=len(context_chunks)
-        )
+        telemetry = _record_success(quiz, usage, context_chunks, start_time,
+                                    request_embedding, cache_key)
         
         return jsonify({
             'questions': quiz,
-            'telemetry': {
-                'latency_ms': latency_ms,
-                'chunks': len(context_chunks),
-                'tokens': int(len(context.split()) * 1.3 + len(str(quiz).split()) * 1.3)
-            }
+            'telemetry': telemetry
         })
         
     except Exception as e:
@@ -301,6 +414,84 @@ def generate_quiz():
         return jsonify({'error': f'Generation failed: {str(e)}'}), 500
 
 
+def _warmup_llm():
+    """Warm up the LLM, reporting failures instead of raising"""
+    try:
+        llm.warmup()
+    except Exception as e:
+        print(f"⚠️  LLM warmup failed: {e}")
+
+
+def _record_success(quiz, usage, context_chunks, start_time, request_embedding, cache_key):
+    """Cache a generated quiz, log telemetry and return response metrics"""
+    import time
+    
+    # Fallback quizzes (no usage) are not worth serving again
+    if usage is not None and request_embedding is not None:
+        response_cache.put(request_embedding, quiz, namespace=cache_key)
+    
+    # Calculate metrics
+    latency_ms = int((time.time() - start_time) * 1000)
+    tokens_input = usage['tokens_input'] if usage else None
+    tokens_output = usage['tokens_output'] if usage else None
+    
+    # Log telemetry (exact counts reported by Ollama)
+    logger.log(
+        pathway='RAG',
+        latency_ms=latency_ms,
+        status='success',
+        tokens_input=tokens_input,
+        tokens_output=tokens_output,
+        chunks_retrieved=len(context_chunks)
+    )
+    
+    tokens = None
+    if tokens_input is not None and tokens_output is not None:
+        tokens = tokens_input + tokens_output
+    
+    return {
+        'latency_ms': latency_ms,
+        'chunks': len(context_chunks),
+        'tokens': tokens
+    }
+
+
+def _stream_quiz(events, context_chunks, start_time, request_embedding, cache_key):
+    """Relay LLM stream events to the client as NDJSON lines"""
+    import time
+    first_token_ms = None
+    
+    try:
+        for event in events:
+            if event['type'] != 'done':
+                if first_token_ms is None:
+                    first_token_ms = int((time.time() - start_time) * 1000)
+                yield json.dumps(event) + '\n'
+            else:
+                telemetry = _record_success(event['questions'], event['usage'], context_chunks,
+                                            start_time, request_embedding, cache_key)
+                telemetry['first_token_ms'] = first_token_ms
+                yield json.dumps({
+                    'type': 'done',
+                    'questions': event['questions'],
+                    'telemetry': telemetry
+                }) + '\n'
+    
+    except Exception as e:
+        latency_ms = int((time.time() - start_time) * 1000)
+        logger.log('RAG', latency_ms, 'error', error=str(e))
+        yield json.dumps({'type': 'error', 'error': f'Generation failed: {str(e)}'}) + '\n'
+
+
+def _warmup():
+    """Pay embedding and LLM cold-start costs before the first request"""
+    try:
+        rag.model.encode("warmup", convert_to_tensor=False)
+    except Exception as e:
+        print(f"⚠️  Embedding warmup failed: {e}")
+    _warmup_llm()
+
+
 def cli_mode(args):
     """CLI interface"""
     print("🎓 Quiz Generator CLI\n")
@@ -328,12 +519,11 @@ def cli_mode(args):
     import time
     start = time.time()
     
-    chunks = rag.chunk_text(notes)
-    rag.build_index(chunks)
-    context_chunks = rag.retrieve(args.topic or "quiz questions", k=TOP_K_CHUNKS)
+    executor.submit(_warmup_llm)
+    context_chunks = rag.build_and_retrieve(notes, args.topic or "quiz questions", k=TOP_K_CHUNKS)
     context = "\n\n".join(context_chunks)
     
-    quiz = llm.generate_quiz(context, args.topic, args.difficulty, args.num)
+    quiz, _ = llm.generate_quiz(context, args.topic, args.difficulty, args.num)
     
     elapsed = time.time() - start
     
@@ -349,6 +539,16 @@ def cli_mode(args):
     print(f"📊 Retrieved {len(context_chunks)} context chunks")
 
 
+def start_warmup():
+    """Warm up in the background while the server starts listening"""
+    threading.Thread(target=_warmup, daemon=True).start()
+
+
+# gunicorn.conf.py disables this and warms each worker after fork instead
+if os.getenv('WARMUP_ON_IMPORT', '1') == '1':
+    start_warmup()
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Quiz Generator')
     parser.add_argument('--cli', action='store_true', help='Run in CLI mode')
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List
+
+
+class EmbeddingStore:
+    """SQLite-backed cache of chunk embeddings that survives restarts"""
+    
+    # Stay under SQLite's default host parameter limit
+    _BATCH = 500
+    
+    def __init__(self, path: str):
+        """
+        Open (or create) the store
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def key(model_name: str, text: str) -> bytes:
+        """Hash a chunk together with the model that embedded it"""
+        return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).digest()
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Fetch stored embeddings
+        
+        Args:
+            keys: Chunk hashes to look up
+        
+        Returns:
+            Mapping of found hashes to float32 vectors; keys that could
+            not be read (locked, corrupt or unwritable file) are left out
+        """
+        found = {}
+        with self._lock:
+            try:
+                conn = self._connection()
+                for i in range(0, len(keys), self._BATCH):
+                    batch = keys[i:i + self._BATCH]
+                    placeholders = ','.join('?' * len(batch))
+                    rows = conn.execute(
+                        f"SELECT chunk_hash, vector FROM emb WHERE chunk_hash IN ({placeholders})",
+                        batch
+                    )
+                    for chunk_hash, vector in rows:
+                        found[chunk_hash] = np.frombuffer(vector, dtype=np.float16).astype(np.float32)
+            except sqlite3.Error as e:
+                # The caller re-embeds whatever is missing
+                print(f"⚠️  Embedding store read failed: {e}")
+        return found
+    
+    def put_many(self, items: Dict[bytes, np.ndarray]) -> None:
+        """
+        Store embeddings as float16
+        
+        A failed write is reported and skipped; the embeddings are only
+        recomputed the next time they are needed.
+        
+        Args:
+            items: Mapping of chunk hashes to vectors
+        """
+        rows = [
+            (chunk_hash, np.asarray(vector, dtype=np.float16).tobytes())
+            for chunk_hash, vector in items.items()
+        ]
+        with self._lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO emb (chunk_hash, vector) VALUES (?, ?)",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                print(f"⚠️  Embedding store write failed: {e}")
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def _connection(self):
+        """Return a connection owned by this process, opening it lazily"""
+        # SQLite connections must not be shared across fork()
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb (chunk_hash BLOB PRIMARY KEY, vector BLOB)"
+            )
+            self._pid = os.getpid()
+        return self._conn
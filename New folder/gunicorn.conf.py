@@ -0,0 +1,30 @@
+import os
+
+# Production entry point: gunicorn -c gunicorn.conf.py app:app
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# /generate blocks on Ollama for seconds, so each worker runs several
+# threads; extra processes spread embedding work across CPU cores
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Generations and streamed responses can outlast the 30s default
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+# Preloading loads the embedding model once and shares it copy-on-write,
+# but imports torch before fork; leave it opt-in
+preload_app = os.getenv('GUNICORN_PRELOAD', '0') == '1'
+
+# Threads don't survive fork, so warm up inside each worker instead
+os.environ['WARMUP_ON_IMPORT'] = '0'
+
+
+def post_worker_init(worker):
+    """Per-worker setup once the app is loaded"""
+    import app
+    
+    # Don't share pooled Ollama sockets inherited from a preloading master
+    app.llm.session.close()
+    app.start_warmup()
@@ -1,6 +1,220 @@
+import os
+import re
 import json
+import time
+import queue
+import threading
 import requests
-from typing import List, Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Callable, List, Dict, Iterator, Optional, Tuple
+
+
+# Characters that change JSON nesting or string state; escape pairs are
+# matched whole so an escaped quote never ends a string
+_JSON_STRUCTURE_RE = re.compile(r'\\.|["{}\[\]\\]', re.DOTALL)
+
+
+class QuestionStreamParser:
+    """Incrementally extracts objects from a JSON array as text arrives"""
+    
+    def __init__(self):
+        self.depth = 0          # 1 inside the outer array, 2+ inside an object
+        self.started = False    # Outer array has opened
+        self.closed = False     # Outer array has ended
+        self._in_string = False
+        self._escape = False    # Fragment ended on a backslash inside a string
+        self._pending = []      # Fragments of the object being read
+    
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Consume the next piece of LLM output
+        
+        Text before the opening '[' (and after the closing ']') is ignored.
+        
+        Args:
+            text: Next response fragment
+            
+        Returns:
+            Objects from the outer array completed by this fragment
+        """
+        if self.closed:
+            return []
+        
+        objects = []
+        pos = 0
+        start = 0 if self.depth >= 2 else None
+        
+        if self._escape:
+            self._escape = False
+            pos = 1
+        
+        for match in _JSON_STRUCTURE_RE.finditer(text, pos):
+            ch = match.group()
+            
+            if self._in_string:
+                if ch == '"':
+                    self._in_string = False
+                elif ch == '\\':
+                    self._escape = True
+                continue
+            
+            if self.depth == 0:
+                if ch == '[':
+                    self.depth = 1
+                    self.started = True
+                continue
+            
+            if ch == '"':
+                self._in_string = True
+            elif ch in '[{':
+                self.depth += 1
+                if self.depth == 2 and ch == '{':
+                    start = match.start()
+            elif ch in ']}':
+                self.depth -= 1
+                if self.depth == 1 and start is not None:
+                    self._pending.append(text[start:match.end()])
+                    try:
+                        objects.append(json.loads(''.join(self._pending)))
+                    except ValueError:
+                        pass  # Skip a malformed question, keep the rest
+                    self._pending = []
+                    start = None
+                elif self.depth == 0:
+                    self.closed = True
+                    break
+        
+        if start is not None:
+            self._pending.append(text[start:])
+        
+        return objects
+
+
+class PromptBatcher:
+    """Groups concurrent prompts into batched OpenAI-style completion calls"""
+    
+    def __init__(
+        self,
+        session: requests.Session,
+        endpoint: str,
+        model: str,
+        format_prompt: Callable[[str], str],
+        window_ms: int = 20,
+        max_batch: int = 16,
+        max_in_flight: int = 4
+    ):
+        """
+        Initialize batcher
+        
+        Args:
+            session: HTTP session used for batched requests
+            endpoint: URL of a /v1/completions endpoint that accepts a prompt list
+            model: Model name sent with each batch
+            format_prompt: Turns a user prompt into a raw completion prompt
+            window_ms: How long to wait for more prompts once one is queued
+            max_batch: Maximum prompts per request
+            max_in_flight: Maximum concurrent batched requests
+        """
+        self.session = session
+        self.endpoint = endpoint
+        self.model = model
+        self.format_prompt = format_prompt
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        
+        self._queue = queue.Queue()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pid = None
+    
+    def submit(self, prompt: str, max_tokens: int = 2000) -> Future:
+        """
+        Queue a user prompt
+        
+        Returns:
+            Future resolving to a dict with the generated 'response' text,
+            plus the OpenAI-style 'usage' when the prompt was sent alone
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((prompt, max_tokens, future))
+        return future
+    
+    def _ensure_started(self) -> None:
+        """Start the collector thread (again, after a fork)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._in_flight = 0
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight)
+                threading.Thread(target=self._collect, daemon=True).start()
+    
+    def _collect(self) -> None:
+        """Drain the queue into batches and dispatch them"""
+        while True:
+            batch = [self._queue.get()]
+            
+            # Alone and nothing pending upstream: send now, no added latency.
+            # Under load, wait the window so concurrent prompts share a call.
+            if self._in_flight or not self._queue.empty():
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+            
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._dispatch, batch)
+    
+    def _dispatch(self, batch) -> None:
+        """Send one batch and resolve its futures"""
+        try:
+            # A lone prompt goes to the same endpoint as a one-element list,
+            # so the model never depends on load
+            texts, usage = self._complete([self.format_prompt(prompt) for prompt, _, _ in batch],
+                                          max(max_tokens for _, max_tokens, _ in batch))
+            for (_, _, future), text in zip(batch, texts):
+                result = {'response': text}
+                # usage totals the whole call, so it is only exact for one prompt
+                if len(batch) == 1 and usage is not None:
+                    result['usage'] = usage
+                future.set_result(result)
+        
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+    
+    def _complete(self, prompts: List[str], max_tokens: int) -> Tuple[List[str], Optional[Dict]]:
+        """POST a prompt list; return completions in prompt order and usage"""
+        response = self.session.post(
+            self.endpoint,
+            json={
+                "model": self.model,
+                "prompt": prompts,
+                "max_tokens": max_tokens,
+                "temperature": 0.7,
+            },
+            timeout=60
+        )
+        response.raise_for_status()
+        
+        body = response.json()
+        choices = sorted(body['choices'], key=lambda c: c['index'])
+        if len(choices) != len(prompts):
+            raise ValueError(f"Expected {len(prompts)} completions, got {len(choices)}")
+        return [choice['text'] for choice in choices], body.get('usage')
 
 
 class LLMClient:
@@ -27,15 +241,59 @@ SAFETY RULES:
 
 Stay focused on creating valuable educational content."""
     
-    def __init__(self, host='http://localhost:11434', model='llama3.2:3b'):
-        """Initialize LLM client"""
+    # Seconds between warmup requests while the model is kept loaded
+    WARMUP_INTERVAL = 60
+    
+    # How long Ollama keeps the model (and its cached system prompt) loaded
+    KEEP_ALIVE = '10m'
+    
+    def __init__(
+        self,
+        host='http://localhost:11434',
+        model='llama3.2:3b',
+        batch_host: Optional[str] = None,
+        batch_model: Optional[str] = None
+    ):
+        """
+        Initialize LLM client
+        
+        Args:
+            host: Ollama server URL
+            model: Model name
+            batch_host: OpenAI-compatible server (vLLM, llama.cpp) whose
+                /v1/completions accepts prompt lists; when set, all
+                non-streaming requests go there, concurrent ones batched
+                into one call (optional)
+            batch_model: Model id batch_host serves; must be the same
+                model as the Ollama one, which still serves streaming
+        """
         self.host = host.rstrip('/')
         self.model = model
-        self.endpoint = f"{self.host}/api/generate"
+        # Chat endpoint: the fixed system message lets Ollama reuse its KV cache
+        self.endpoint = f"{self.host}/api/chat"
+        
+        # Pooled keep-alive connections shared across requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._warm_until = 0.0
+        
+        self.batcher = None
+        if batch_host and not batch_model:
+            # Ollama tags like llama3.2:3b aren't served model ids elsewhere
+            print("⚠️  Warning: batch_host set without batch_model; batching disabled")
+        elif batch_host:
+            self.batcher = PromptBatcher(
+                self.session,
+                f"{batch_host.rstrip('/')}/v1/completions",
+                batch_model,
+                format_prompt=self._format_prompt
+            )
         
         # Test connection
         try:
-            response = requests.get(f"{self.host}/api/tags", timeout=5)
+            response = self.session.get(f"{self.host}/api/tags", timeout=5)
             response.raise_for_status()
             print(f"✓ Connected to Ollama at {host}")
             print(f"✓ Using model: {model}")
@@ -43,13 +301,35 @@ Stay focused on creating valuable educational content."""
             print(f"⚠️  Warning: Could not connect to Ollama: {e}")
             print("   Make sure Ollama is running: ollama serve")
     
+    def warmup(self, keep_alive: str = KEEP_ALIVE) -> None:
+        """
+        Ask Ollama to load the model so the next generation starts hot
+        
+        A request with no messages only loads the model. Calls within
+        WARMUP_INTERVAL of the last successful warmup are skipped.
+        
+        Args:
+            keep_alive: How long Ollama should keep the model in memory
+        """
+        now = time.monotonic()
+        if now < self._warm_until:
+            return
+        
+        response = self.session.post(
+            self.endpoint,
+            json={"model": self.model, "messages": [], "keep_alive": keep_alive, "stream": False},
+            timeout=60
+        )
+        response.raise_for_status()
+        self._warm_until = now + self.WARMUP_INTERVAL
+    
     def generate_quiz(
         self,
         context: str,
         topic: str,
         difficulty: str,
         num_questions: int
-    ) -> List[Dict]:
+    ) -> Tuple[List[Dict], Optional[Dict]]:
         """
         Generate quiz questions using LLM
         
@@ -60,10 +340,85 @@ Stay focused on creating valuable educational content."""
             num_questions: Number of questions to generate
             
         Returns:
-            List of question dictionaries with question, hint, rubric
+            Tuple of (list of question dictionaries with question, hint,
+            rubric; token usage, or None if the fallback was used)
+        """
+        user_prompt = self._build_prompt(context, topic, difficulty, num_questions)
+        
+        # Call LLM (batched with concurrent requests when configured)
+        try:
+            if self.batcher is not None:
+                result = self.batcher.submit(user_prompt).result()
+            else:
+                result = self._call_ollama(user_prompt)
+            questions = self._parse_response(result['response'], num_questions)
+            return questions, self._usage(result)
+        except Exception as e:
+            print(f"LLM error: {e}")
+            # Fallback to template-based generation
+            return self._generate_fallback(context, topic, difficulty, num_questions), None
+    
+    def generate_quiz_stream(
+        self,
+        context: str,
+        topic: str,
+        difficulty: str,
+        num_questions: int
+    ) -> Iterator[Dict]:
+        """
+        Generate quiz questions, yielding events as tokens arrive
+        
+        Closing the generator early closes the Ollama connection, which
+        cancels the generation server-side.
+        
+        Args:
+            context: Retrieved context from RAG
+            topic: Specific topic (can be empty)
+            difficulty: easy, medium, or hard
+            num_questions: Number of questions to generate
+            
+        Yields:
+            {'type': 'token', 'text': ...} per generated fragment,
+            {'type': 'question', 'index': ..., 'question': {...}} as soon as
+            each question is complete, then one
+            {'type': 'done', 'questions': [...], 'usage': {...} or None}
         """
-        # Build prompt
-        user_prompt = f"""Based on the following context, generate {num_questions} {difficulty}-level quiz questions.
+        user_prompt = self._build_prompt(context, topic, difficulty, num_questions)
+        
+        try:
+            parser = QuestionStreamParser()
+            questions = []
+            final = {}
+            for fragment in self._stream_ollama(user_prompt, final=final):
+                yield {'type': 'token', 'text': fragment}
+                
+                for q in parser.feed(fragment):
+                    question = self._validate_question(q)
+                    if question and len(questions) < num_questions:
+                        yield {'type': 'question', 'index': len(questions), 'question': question}
+                        questions.append(question)
+            
+            if not parser.started:
+                raise ValueError("No JSON array found in response")
+            questions = self._pad_questions(questions, num_questions)
+            usage = self._usage(final)
+        except Exception as e:
+            print(f"LLM error: {e}")
+            # Fallback to template-based generation
+            questions = self._generate_fallback(context, topic, difficulty, num_questions)
+            usage = None
+        
+        yield {'type': 'done', 'questions': questions, 'usage': usage}
+    
+    def _build_prompt(
+        self,
+        context: str,
+        topic: str,
+        difficulty: str,
+        num_questions: int
+    ) -> str:
+        """Build the user prompt for quiz generation"""
+        return f"""Based on the following context, generate {num_questions} {difficulty}-level quiz questions.
 
 CONTEXT:
 {context}
@@ -86,76 +441,132 @@ Response format:
 ]
 
 Generate exactly {num_questions} questions. Output ONLY the JSON array, no other text."""
+    
+    def _format_prompt(self, prompt: str) -> str:
+        """Flatten system and user prompt for plain completion endpoints"""
+        return f"{self.SYSTEM_PROMPT}\n\nUser: {prompt}\n\nAssistant:"
+    
+    def _call_ollama(self, prompt: str, max_tokens: int = 2000) -> Dict:
+        """
+        Call Ollama API
         
-        # Call LLM
-        try:
-            response = self._call_ollama(user_prompt)
-            questions = self._parse_response(response, num_questions)
-            return questions
-        except Exception as e:
-            print(f"LLM error: {e}")
-            # Fallback to template-based generation
-            return self._generate_fallback(context, topic, difficulty, num_questions)
+        Returns:
+            Final Ollama response object (prompt_eval_count, eval_count, ...)
+            with 'response' holding the full generated text
+        """
+        final = {}
+        text = ''.join(self._stream_ollama(prompt, max_tokens, final=final))
+        final['response'] = text
+        return final
     
-    def _call_ollama(self, prompt: str, max_tokens: int = 2000) -> str:
-        """Call Ollama API"""
+    def _stream_ollama(
+        self,
+        prompt: str,
+        max_tokens: int = 2000,
+        final: Optional[Dict] = None
+    ) -> Iterator[str]:
+        """
+        Call Ollama API with streaming, yielding response text fragments
+        
+        Args:
+            prompt: User prompt
+            max_tokens: Generation limit
+            final: If given, filled with the closing chunk (token counts)
+        """
+        # System message first and unchanged so the prefix is cached
         payload = {
             "model": self.model,
-            "prompt": f"{self.SYSTEM_PROMPT}\n\nUser: {prompt}\n\nAssistant:",
-            "stream": False,
+            "messages": [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "stream": True,
+            "keep_alive": self.KEEP_ALIVE,
             "options": {
                 "temperature": 0.7,
                 "num_predict": max_tokens,
             }
         }
         
-        response = requests.post(
+        with self.session.post(
             self.endpoint,
             json=payload,
+            stream=True,
             timeout=60
-        )
-        response.raise_for_status()
+        ) as response:
+            response.raise_for_status()
+            
+            # Ollama streams one JSON object per line
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                
+                chunk = json.loads(line)
+                if 'error' in chunk:
+                    raise RuntimeError(chunk['error'])
+                
+                content = chunk.get('message', {}).get('content')
+                if content:
+                    yield content
+                
+                if chunk.get('done'):
+                    if final is not None:
+                        final.update(chunk)
+                    break
+    
+    def _usage(self, result: Dict) -> Dict:
+        """Extract exact token counts from an Ollama or batched response"""
+        usage = result.get('usage')
+        if usage is not None:
+            # OpenAI-style usage from a batch_host call
+            return {
+                'tokens_input': usage.get('prompt_tokens'),
+                'tokens_output': usage.get('completion_tokens')
+            }
         
-        result = response.json()
-        return result.get('response', '')
+        return {
+            'tokens_input': result.get('prompt_eval_count'),
+            'tokens_output': result.get('eval_count')
+        }
     
     def _parse_response(self, response: str, expected_count: int) -> List[Dict]:
         """Parse LLM response into structured quiz data"""
         try:
-            # Try to find JSON in response
-            start = response.find('[')
-            end = response.rfind(']') + 1
+            # Single pass over the response, same parser as the stream
+            parser = QuestionStreamParser()
+            questions = parser.feed(response)
             
-            if start == -1 or end == 0:
+            if not parser.started:
                 raise ValueError("No JSON array found in response")
             
-            json_str = response[start:end]
-            questions = json.loads(json_str)
-            
-            # Validate structure
-            if not isinstance(questions, list):
-                raise ValueError("Response is not a list")
-            
             validated = []
             for q in questions[:expected_count]:
-                if all(k in q for k in ['question', 'hint', 'rubric']):
-                    validated.append({
-                        'question': str(q['question']).strip(),
-                        'hint': str(q['hint']).strip(),
-                        'rubric': str(q['rubric']).strip()
-                    })
-            
-            if len(validated) < expected_count:
-                # Pad with fallback questions if needed
-                while len(validated) < expected_count:
-                    validated.append(self._create_fallback_question(len(validated) + 1))
+                question = self._validate_question(q)
+                if question:
+                    validated.append(question)
             
-            return validated
+            return self._pad_questions(validated, expected_count)
             
         except Exception as e:
             print(f"Parse error: {e}")
             raise
     
+    def _validate_question(self, q) -> Optional[Dict]:
+        """Normalize a parsed question, or None if fields are missing"""
+        if not isinstance(q, dict) or not all(k in q for k in ['question', 'hint', 'rubric']):
+            return None
+        return {
+            'question': str(q['question']).strip(),
+            'hint': str(q['hint']).strip(),
+            'rubric': str(q['rubric']).strip()
+        }
+    
+    def _pad_questions(self, validated: List[Dict], expected_count: int) -> List[Dict]:
+        """Pad with fallback questions if needed"""
+        while len(validated) < expected_count:
+            validated.append(self._create_fallback_question(len(validated) + 1))
+        return validated
+    
     def _generate_fallback(
         self,
         context: str,
@@ -211,7 +622,7 @@ if __name__ == '__main__':
     print("Testing quiz generation...")
     print("="*60)
     
-    quiz = client.generate_quiz(
+    quiz, usage = client.generate_quiz(
         context=sample_context,
         topic="Photosynthesis basics",
         difficulty="medium",
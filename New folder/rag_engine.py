@@ -1,17 +1,71 @@
+import re
+import hashlib
+import threading
 import numpy as np
-from typing import List
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
 from sentence_transformers import SentenceTransformer
 
+try:
+    import faiss
+except ImportError:  # Optional: brute-force scan is used without it
+    faiss = None
+
+from embedding_store import EmbeddingStore
+
+# Paragraph breaks and sentence boundaries (punctuation stays with its sentence)
+_PARA_RE = re.compile(r'\n\n+')
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+
 
 class RAGEngine:
     """Retrieval Augmented Generation engine using embeddings"""
     
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        """Initialize with embedding model"""
+    # Corpora at least this large are searched with a FAISS HNSW graph
+    ANN_MIN_CHUNKS = 500
+    
+    def __init__(
+        self,
+        model_name='all-MiniLM-L6-v2',
+        corpus_cache_size: int = 64,
+        store_path: Optional[str] = None,
+        precision: str = 'auto',
+        max_seq_length: int = 256
+    ):
+        """
+        Initialize with embedding model
+        
+        Args:
+            model_name: SentenceTransformer model to load
+            corpus_cache_size: Number of indexed notes kept in memory
+            store_path: SQLite file for persistent chunk embeddings (optional)
+            precision: 'auto' (fp16 on CUDA, else fp32), 'fp32', 'fp16' or 'bf16'
+            max_seq_length: Token budget per input; longer text is truncated
+                by the tokenizer before the forward pass
+        """
         print(f"Loading embedding model: {model_name}...")
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
+        self._set_precision(precision)
+        
+        # Never run attention over more tokens than the budget
+        self.model.max_seq_length = min(self.model.max_seq_length or max_seq_length,
+                                        max_seq_length)
         self.chunks = []
-        self.embeddings = None
+        self.embeddings = None  # L2-normalized rows
+        self._ann_index = None
+        
+        # Per-instance LRU so repeated queries skip the transformer
+        self._encode_query = lru_cache(maxsize=1024)(self._encode_query_uncached)
+        
+        # LRU of notes hash -> index tuple (see _make_index)
+        self._corpus_cache = OrderedDict()
+        self._corpus_cache_size = corpus_cache_size
+        self._corpus_lock = threading.Lock()
+        
+        # Optional on-disk chunk embedding cache shared across runs
+        self.store = EmbeddingStore(store_path) if store_path else None
         print("✓ RAG engine ready")
     
     def chunk_text(self, text: str, min_chunk_size: int = 50) -> List[str]:
@@ -26,7 +80,7 @@ class RAGEngine:
             List of text chunks
         """
         # Split by double newlines (paragraphs)
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+        paragraphs = [p.strip() for p in _PARA_RE.split(text) if p.strip()]
         
         # Further split long paragraphs by sentences
         chunks = []
@@ -38,18 +92,22 @@ class RAGEngine:
                 else:
                     chunks.append(para)
             elif len(para) > 500:
-                # Split long paragraphs by sentences
-                sentences = [s.strip() + '.' for s in para.split('.') if s.strip()]
-                current_chunk = ''
-                for sent in sentences:
-                    if len(current_chunk) + len(sent) < 300:
-                        current_chunk += ' ' + sent
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk.strip())
-                        current_chunk = sent
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
+                # Split long paragraphs by sentences, greedily packing
+                # them into ~300 char chunks (join once per chunk)
+                buffer = []
+                buffer_len = 0
+                for sent in _SENT_RE.split(para):
+                    sent = sent.strip()
+                    if not sent:
+                        continue
+                    if buffer and buffer_len + len(sent) >= 300:
+                        chunks.append(' '.join(buffer))
+                        buffer = []
+                        buffer_len = 0
+                    buffer.append(sent)
+                    buffer_len += len(sent) + 1
+                if buffer:
+                    chunks.append(' '.join(buffer))
             else:
                 chunks.append(para)
         
@@ -65,19 +123,64 @@ class RAGEngine:
         Args:
             chunks: List of text chunks to embed
         """
-        self.chunks = chunks
         if not chunks:
-            self.embeddings = np.array([])
+            self._use_index(self._make_index(chunks, np.array([])))
             return
         
-        print(f"Embedding {len(chunks)} chunks...")
-        self.embeddings = self.model.encode(
-            chunks,
-            convert_to_tensor=False,
-            show_progress_bar=False
-        )
+        _, embeddings = self._encode_chunks(chunks)
+        self._use_index(self._make_index(chunks, embeddings))
         print(f"✓ Built index with {len(chunks)} chunks")
     
+    def build_and_retrieve(self, text: str, query: str, k: int = 3) -> List[str]:
+        """
+        Index text and retrieve top-k chunks for a query in one pass
+        
+        Chunking and embedding are cached by a hash of text, so repeat
+        submissions of the same notes skip both. On a cache miss the
+        query and chunks are embedded in a single batch instead of two
+        separate encode calls.
+        
+        Args:
+            text: Raw notes to index
+            query: Search query
+            k: Number of chunks to retrieve
+            
+        Returns:
+            List of most relevant chunks
+        """
+        index, query_embedding = self._index_for_text(text, query)
+        
+        self._use_index(index)
+        if not index[0]:
+            return []
+        
+        return self._rank(query_embedding, index, k)
+    
+    def notes_embedding(self, text: str):
+        """
+        Embed the whole of text for the semantic response cache
+        
+        Uses the mean of the chunk embeddings: a single encode of text
+        only sees its first max_seq_length tokens, so edits later in long
+        notes would not change it. Call it after build_and_retrieve on the
+        same text, which leaves the index in the corpus cache, so nothing
+        is encoded here; text is only indexed again if it was evicted.
+        
+        Args:
+            text: Raw notes
+            
+        Returns:
+            Tuple of (mean unit chunk embedding or None, number of chunks)
+        """
+        index = self._get_cached_corpus(self._corpus_key(text))
+        if index is None:
+            index, _ = self._index_for_text(text)
+        chunks, unit, _ = index
+        if not chunks:
+            return None, 0
+        
+        return unit.mean(axis=0), len(chunks)
+    
     def retrieve(self, query: str, k: int = 3) -> List[str]:
         """
         Retrieve top-k most relevant chunks
@@ -92,29 +195,198 @@ class RAGEngine:
         if not self.chunks or self.embeddings is None or len(self.embeddings) == 0:
             return []
         
-        # Encode query
-        query_embedding = self.model.encode(query, convert_to_tensor=False)
+        # Encode query (cached)
+        query_embedding = self._encode_query(query)
+        
+        return self._rank(query_embedding, self._active_index(), k)
+    
+    def _make_index(self, chunks: List[str], embeddings):
+        """
+        Bundle chunks with everything retrieval needs precomputed
+        
+        Rows are L2-normalized once here, so scoring a query is a single
+        matrix-vector product. Large corpora additionally get an
+        approximate HNSW index.
+        
+        Returns:
+            Tuple of (chunks, unit-norm embeddings, HNSW index or None)
+        """
+        if not len(embeddings):
+            return (chunks, embeddings, None)
+        
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        unit = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-10)
+        
+        ann_index = None
+        if faiss is not None and len(chunks) >= self.ANN_MIN_CHUNKS:
+            # Inner product on unit vectors is cosine similarity
+            ann_index = faiss.IndexHNSWFlat(unit.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            ann_index.hnsw.efConstruction = 40
+            ann_index.hnsw.efSearch = 64
+            ann_index.add(unit)
+        
+        return (chunks, unit, ann_index)
+    
+    def _use_index(self, index) -> None:
+        """Make an index tuple the active index"""
+        self.chunks, self.embeddings, self._ann_index = index
+    
+    def _active_index(self):
+        """Return the active index as a tuple"""
+        return (self.chunks, self.embeddings, self._ann_index)
+    
+    def _rank(self, query_embedding, index, k: int) -> List[str]:
+        """Return the k chunks most similar to the query embedding"""
+        chunks, unit, ann_index = index
+        query_unit = self._normalize(query_embedding)
+        
+        if ann_index is not None:
+            # Graph search; results already come back best-first
+            _, indices = ann_index.search(query_unit.reshape(1, -1), min(k, len(chunks)))
+            return [chunks[i] for i in indices[0] if i >= 0]
         
-        # Calculate cosine similarities
-        similarities = self._cosine_similarity(query_embedding, self.embeddings)
+        # Cosine similarity: one fp32 matrix-vector product against unit
+        # rows. NumPy has no int8 BLAS kernel, so scoring int8-quantized
+        # rows would be slower, not faster
+        similarities = unit @ query_unit
         
-        # Get top-k indices
-        k = min(k, len(self.chunks))
-        top_indices = np.argsort(similarities)[-k:][::-1]
+        # Get top-k indices: linear-time selection, then sort only those k
+        k = min(k, len(chunks))
+        candidates = np.argpartition(similarities, -k)[-k:]
+        top_indices = candidates[np.argsort(-similarities[candidates])]
         
         # Return chunks in relevance order
-        return [self.chunks[i] for i in top_indices]
+        return [chunks[i] for i in top_indices]
     
-    def _cosine_similarity(self, vec1, vec2):
-        """Calculate cosine similarity between vectors"""
-        if vec2.ndim == 1:
-            vec2 = vec2.reshape(1, -1)
+    def _index_for_text(self, text: str, query: Optional[str] = None):
+        """
+        Chunk and index text, reusing cached results for repeated input
+        
+        Args:
+            text: Raw notes to index
+            query: Query to embed alongside the chunks (optional)
+            
+        Returns:
+            Tuple of (index tuple, query embedding or None)
+        """
+        key = self._corpus_key(text)
+        index = self._get_cached_corpus(key)
+        
+        if index is not None:
+            chunks = index[0]
+            query_embedding = self._encode_query(query) if chunks and query is not None else None
+            print(f"✓ Reused cached index with {len(chunks)} chunks")
+            return index, query_embedding
         
-        dot_product = np.dot(vec2, vec1)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2, axis=1)
+        chunks = self.chunk_text(text)
+        if chunks:
+            query_embedding, embeddings = self._encode_chunks(chunks, query)
+            print(f"✓ Built index with {len(chunks)} chunks")
+        else:
+            query_embedding, embeddings = None, np.array([])
+        index = self._make_index(chunks, embeddings)
+        self._cache_corpus(key, index)
         
-        return dot_product / (norm1 * norm2 + 1e-10)
+        return index, query_embedding
+    
+    def _corpus_key(self, text: str) -> str:
+        """Content hash used as the corpus cache key"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _get_cached_corpus(self, key: str):
+        """Return the cached index tuple for key, or None"""
+        with self._corpus_lock:
+            cached = self._corpus_cache.get(key)
+            if cached is not None:
+                self._corpus_cache.move_to_end(key)
+            return cached
+    
+    def _cache_corpus(self, key: str, index) -> None:
+        """Store an index tuple, evicting the least recently used entry"""
+        with self._corpus_lock:
+            self._corpus_cache[key] = index
+            if len(self._corpus_cache) > self._corpus_cache_size:
+                self._corpus_cache.popitem(last=False)
+    
+    def _encode_chunks(self, chunks: List[str], query: Optional[str] = None):
+        """
+        Embed chunks, reusing vectors from the persistent store
+        
+        Only chunks missing from the store are run through the model,
+        batched together with the query when one is given.
+        
+        Args:
+            chunks: Non-empty list of text chunks
+            query: Optional query to embed in the same batch
+            
+        Returns:
+            Tuple of (query embedding or None, chunk embedding matrix)
+        """
+        if self.store is not None:
+            keys = [EmbeddingStore.key(self.model_name, c) for c in chunks]
+            stored = self.store.get_many(keys)
+            missing = [i for i, key in enumerate(keys) if key not in stored]
+        else:
+            keys, stored = [], {}
+            missing = list(range(len(chunks)))
+        
+        texts = ([query] if query is not None else []) + [chunks[i] for i in missing]
+        query_embedding = None
+        
+        if texts:
+            if missing:
+                print(f"Embedding {len(missing)} chunks...")
+            batch = self.model.encode(
+                texts,
+                batch_size=64,
+                convert_to_tensor=False,
+                show_progress_bar=False
+            )
+            # Half-precision models return fp16; downstream math is fp32
+            batch = np.asarray(batch, dtype=np.float32)
+            if query is not None:
+                query_embedding, batch = batch[0], batch[1:]
+        
+        # Assemble in original chunk order
+        dim = self.model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(chunks), dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            if key in stored:
+                embeddings[i] = stored[key]
+        if missing:
+            embeddings[missing] = batch
+        
+        if self.store is not None and missing:
+            self.store.put_many({keys[i]: embeddings[i] for i in missing})
+        
+        return query_embedding, embeddings
+    
+    def _encode_query_uncached(self, query: str):
+        """Encode a single query string"""
+        return np.asarray(self.model.encode(query, convert_to_tensor=False), dtype=np.float32)
+    
+    def _set_precision(self, precision: str) -> None:
+        """Cast model weights for faster half-precision inference"""
+        if precision == 'auto':
+            # CPUs without native fp16 matmul are slower in half precision
+            precision = 'fp16' if self.model.device.type == 'cuda' else 'fp32'
+        
+        if precision == 'fp16':
+            self.model.half()
+        elif precision == 'bf16':
+            import torch
+            torch.set_float32_matmul_precision('medium')
+            self.model.to(torch.bfloat16)
+        elif precision != 'fp32':
+            raise ValueError(f"Unknown precision: {precision}")
+        
+        if precision != 'fp32':
+            print(f"✓ Embedding model running in {precision}")
+    
+    def _normalize(self, vector):
+        """Return vector as a float32 unit vector"""
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-10)
     
     def get_stats(self):
         """Return indexing statistics"""
@@ -0,0 +1,86 @@
+import threading
+import numpy as np
+from typing import Any, Hashable, Optional
+
+
+class SemanticCache:
+    """Response cache keyed by embedding similarity"""
+    
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1024):
+        """
+        Initialize an empty cache
+        
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum cached responses (oldest evicted first)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries = []      # (namespace, response) in insertion order
+        self.matrix = None     # Stacked unit-normalized embeddings
+        self._lock = threading.Lock()
+    
+    def get(self, embedding, namespace: Hashable = None) -> Optional[Any]:
+        """
+        Look up a response for a similar embedding
+        
+        Args:
+            embedding: Query embedding vector
+            namespace: Only entries stored under the same namespace can match
+        
+        Returns:
+            Cached response, or None on a miss
+        """
+        query = self._normalize(embedding)
+        
+        with self._lock:
+            if self.matrix is None:
+                return None
+            
+            similarities = self.matrix @ query
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            
+            # Best match first; skip entries from other namespaces
+            for i in candidates[np.argsort(-similarities[candidates])]:
+                entry_namespace, response = self.entries[i]
+                if entry_namespace == namespace:
+                    return response
+        
+        return None
+    
+    def put(self, embedding, response: Any, namespace: Hashable = None) -> None:
+        """
+        Store a response under its query embedding
+        
+        Args:
+            embedding: Query embedding vector
+            response: Response to return on future hits
+            namespace: Namespace the entry belongs to
+        """
+        row = self._normalize(embedding).reshape(1, -1)
+        
+        with self._lock:
+            if self.matrix is None:
+                self.matrix = row
+            else:
+                # FIFO eviction once full
+                if len(self.entries) >= self.max_entries:
+                    self.entries.pop(0)
+                    self.matrix = self.matrix[1:]
+                self.matrix = np.vstack([self.matrix, row])
+            self.entries.append((namespace, response))
+    
+    def clear(self) -> None:
+        """Drop all cached responses"""
+        with self._lock:
+            self.entries = []
+            self.matrix = None
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    @staticmethod
+    def _normalize(vec):
+        """Return vec as a float32 unit vector"""
+        vec = np.asarray(vec, dtype=np.float32).ravel()
+        return vec / (np.linalg.norm(vec) + 1e-10)
@@ -1,20 +1,301 @@
 import os
 import json
-from datetime import datetime
-from typing import Optional
+import mmap
+import time
+import queue
+import struct
+import atexit
+import threading
+import numpy as np
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.json as paj
+except ImportError:
+    pa = None
+
+
+# Buffers per writev() call (POSIX requires at least 16)
+try:
+    _IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+
+# Tells the writer thread to stop
+_STOP = object()
+
+# The stats sidecar is rewritten at most every this many seconds or
+# entries, and on close(); a stale sidecar only means the next get_stats()
+# in a fresh process scans a little more of the log
+_STATS_SAVE_INTERVAL_S = 5.0
+_STATS_SAVE_ENTRIES = 1000
+
+# How often flush() checks that the writer thread is still alive
+_FLUSH_POLL_S = 0.5
+
+# Fixed-width record for record_format='binary'. Strings are NUL-padded
+# and truncated to their field width; FLAG_* bits mark which optional
+# integer fields were given.
+_BINARY_FIELDS = [
+    ('ts_ns', '<u8'),
+    ('latency_ms', '<i4'),
+    ('tokens_input', '<i4'),
+    ('tokens_output', '<i4'),
+    ('chunks_retrieved', '<i2'),
+    ('flags', 'u1'),
+    ('status', 'S8'),
+    ('pathway', 'S16'),
+    ('error', 'S48'),
+]
+_BINARY_RECORD = struct.Struct('<QiiihB8s16s48s')
+_BINARY_DTYPE = np.dtype(_BINARY_FIELDS)
+assert _BINARY_DTYPE.itemsize == _BINARY_RECORD.size
+
+FLAG_TOKENS_INPUT = 1
+FLAG_TOKENS_OUTPUT = 2
+FLAG_CHUNKS = 4
+
+
+def _format_ts(ts_ns: int) -> str:
+    """ISO 8601 UTC timestamp for a time.time_ns() value"""
+    seconds, nanos = divmod(int(ts_ns), 1_000_000_000)
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds)) + f".{nanos // 1000:06d}Z"
+
+
+# Columns recompute_stats needs; other fields are skipped by the parser
+if pa is not None:
+    _ARROW_PARSE_OPTIONS = paj.ParseOptions(
+        explicit_schema=pa.schema([
+            ('status', pa.string()),
+            ('latency_ms', pa.int64()),
+            ('tokens_total', pa.int64()),
+        ]),
+        unexpected_field_behavior='ignore'
+    )
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _json_str(value: str) -> str:
+    """JSON string literal; plain ASCII (pathway, status) skips escaping"""
+    if value.isascii() and value.isprintable() and '"' not in value and '\\' not in value:
+        return f'"{value}"'
+    return json.dumps(value, ensure_ascii=False)
+
+
+# (minute since epoch, 'YYYY-MM-DDTHH:MM:') for the current minute
+_ts_prefix = (None, '')
+
+
+def _utc_timestamp() -> str:
+    """ISO 8601 UTC timestamp with microseconds, e.g. 2025-01-15T10:30:45.123456Z"""
+    global _ts_prefix
+    
+    micros = time.time_ns() // 1000
+    minute, rest = divmod(micros, 60_000_000)
+    
+    # Date and time up to the minute is formatted once per minute
+    cached_minute, prefix = _ts_prefix
+    if minute != cached_minute:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:', time.gmtime(minute * 60))
+        _ts_prefix = (minute, prefix)
+    
+    seconds, fraction = divmod(rest, 1_000_000)
+    return f"{prefix}{seconds:02d}.{fraction:06d}Z"
+
+
+def _aggregate_loop(latencies, tokens, ok):
+    """
+    Single-pass totals and latency percentiles over a full log scan
+    
+    Args:
+        latencies: int64 latency per entry, -1 if missing
+        tokens: int64 tokens_total per entry, -1 if missing
+        ok: uint8 success flag per entry
+    
+    Returns:
+        (successes, sum_latency, n_latency, sum_tokens, n_tokens, p50, p95, p99)
+    """
+    successes = 0
+    sum_latency = 0
+    n_latency = 0
+    sum_tokens = 0
+    n_tokens = 0
+    present = np.empty(latencies.shape[0], dtype=np.int64)
+    
+    for i in range(latencies.shape[0]):
+        if ok[i]:
+            successes += 1
+        if latencies[i] >= 0:
+            sum_latency += latencies[i]
+            present[n_latency] = latencies[i]
+            n_latency += 1
+        if tokens[i] >= 0:
+            sum_tokens += tokens[i]
+            n_tokens += 1
+    
+    p50, p95, p99 = _percentiles(present[:n_latency])
+    return successes, sum_latency, n_latency, sum_tokens, n_tokens, p50, p95, p99
+
+
+def _aggregate_vectorized(latencies, tokens, ok):
+    """NumPy equivalent of _aggregate_loop for installs without numba"""
+    present = latencies[latencies >= 0]
+    counted = tokens[tokens >= 0]
+    p50, p95, p99 = _percentiles(present)
+    return (int(np.count_nonzero(ok)), int(present.sum()), len(present),
+            int(counted.sum()), len(counted), p50, p95, p99)
+
+
+def _percentiles(values):
+    """Nearest-rank p50/p95/p99 of an int64 array (0 if empty)"""
+    n = values.shape[0]
+    if n == 0:
+        return 0, 0, 0
+    ranked = np.sort(values)
+    return (ranked[max(int(np.ceil(0.50 * n)) - 1, 0)],
+            ranked[max(int(np.ceil(0.95 * n)) - 1, 0)],
+            ranked[max(int(np.ceil(0.99 * n)) - 1, 0)])
+
+
+if njit is not None:
+    # cache=True keeps the compiled kernels on disk across runs
+    _percentiles = njit(cache=True)(_percentiles)
+    _aggregate = njit(cache=True, fastmath=True)(_aggregate_loop)
+else:
+    _aggregate = _aggregate_vectorized
+
+
+# Log-linear latency histogram for the running aggregate: latencies under
+# 64ms get exact buckets, and each power of two above that is split into
+# 32 buckets, so a reported percentile is within ~3% of the true value
+_HIST_SUB_BITS = 5
+_HIST_MAX_MS = (1 << 26) - 1  # ~18.6 hours; longer latencies are clamped
+
+
+def _hist_index(latency_ms: int) -> int:
+    """Bucket holding a latency"""
+    value = min(max(int(latency_ms), 0), _HIST_MAX_MS)
+    shift = max(value.bit_length() - _HIST_SUB_BITS - 1, 0)
+    return (shift << _HIST_SUB_BITS) + (value >> shift)
+
+
+def _as_int(value) -> Optional[int]:
+    """A logged number as an int, or None if it is absent or malformed"""
+    if value is None or isinstance(value, (bool, str)):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _hist_indices(latencies: np.ndarray) -> np.ndarray:
+    """Vectorized _hist_index"""
+    values = np.clip(latencies, 0, _HIST_MAX_MS)
+    # frexp's exponent equals int.bit_length() for these magnitudes
+    shift = np.maximum(np.frexp(values)[1] - _HIST_SUB_BITS - 1, 0)
+    return (shift << _HIST_SUB_BITS) + (values >> shift)
+
+
+def _hist_value(index: int) -> int:
+    """Largest latency that falls in a bucket"""
+    shift = max((index >> _HIST_SUB_BITS) - 1, 0)
+    mantissa = index - (shift << _HIST_SUB_BITS)
+    return ((mantissa + 1) << shift) - 1
+
+
+def _hist_percentiles(hist: List[int]) -> Tuple[int, int, int]:
+    """Nearest-rank p50/p95/p99 from histogram counts (0 if empty)"""
+    cumulative = np.cumsum(hist)
+    n = int(cumulative[-1])
+    if n == 0:
+        return 0, 0, 0
+    return tuple(
+        _hist_value(int(np.searchsorted(cumulative, max(int(np.ceil(q * n)), 1))))
+        for q in (0.50, 0.95, 0.99)
+    )
+
+
+_HIST_BUCKETS = _hist_index(_HIST_MAX_MS) + 1
 
 
 class TelemetryLogger:
     """Logger for tracking LLM requests and performance"""
     
-    def __init__(self, log_dir='./logs'):
-        """Initialize logger with output directory"""
+    def __init__(
+        self,
+        log_dir='./logs',
+        max_batch: int = 256,
+        record_format: str = 'jsonl'
+    ):
+        """
+        Initialize logger with output directory
+        
+        Args:
+            log_dir: Directory for telemetry.jsonl
+            max_batch: Most entries the writer thread appends per write
+            record_format: 'jsonl' (telemetry.jsonl) or 'binary'
+                (fixed-width records in telemetry.bin; see to_jsonl())
+        """
+        if record_format not in ('jsonl', 'binary'):
+            raise ValueError(f"Unknown record format: {record_format}")
+        
         self.log_dir = log_dir
-        self.log_file = os.path.join(log_dir, 'telemetry.jsonl')
+        self.binary = record_format == 'binary'
+        self.log_file = os.path.join(log_dir, 'telemetry.bin' if self.binary else 'telemetry.jsonl')
+        self.stats_file = self.log_file + '.stats.json'
         
         # Create logs directory if it doesn't exist
         os.makedirs(log_dir, exist_ok=True)
         
+        # log() only enqueues; a writer thread drains the queue and
+        # appends whatever has accumulated in one batch
+        self._queue = queue.SimpleQueue()
+        self._max_batch = max_batch
+        
+        # Batch scratch buffer owned by the writer thread; it is never
+        # shrunk, so steady-state batches reuse its memory
+        self._buf = bytearray(1 << 16)
+        self._buf_len = 0
+        self._buf_count = 0
+        self._buf_lock = threading.Lock()
+        self._writer = None
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+        
+        # Running totals for the first 'offset' bytes of the log, plus
+        # totals for entries still in the buffer
+        self._agg = self._load_agg()
+        self._pending = self._empty_agg()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        
+        # One append-mode handle for the logger's lifetime; unbuffered
+        # because batches go straight to the fd with writev
+        self._fh = open(self.log_file, 'ab', buffering=0)
+        atexit.register(self.close)
+        
+        # Drain the queue before fork() so entries pending in the parent
+        # aren't written again by each child
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self.flush, after_in_child=self._reset_after_fork)
+        
+        self._ensure_writer()
+        
         print(f"✓ Telemetry logging to: {self.log_file}")
     
     def log(
@@ -39,73 +320,613 @@ class TelemetryLogger:
             chunks_retrieved: Number of RAG chunks retrieved (optional)
             error: Error message if status is 'error' (optional)
         """
-        log_entry = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'pathway': pathway,
-            'latency_ms': latency_ms,
-            'status': status,
-        }
+        # Accept any numeric latency (float, NumPy scalar); logs store ints
+        latency_ms = int(latency_ms)
+        
+        tokens_total = None
+        if tokens_input is not None and tokens_output is not None:
+            tokens_total = int(tokens_input + tokens_output)
+        
+        if self.binary:
+            record = self._encode_binary(pathway, latency_ms, status, tokens_input,
+                                         tokens_output, chunks_retrieved, error)
+        else:
+            record = self._encode_json(pathway, latency_ms, status, tokens_input,
+                                       tokens_output, tokens_total, chunks_retrieved, error)
+        
+        # No I/O on the caller's thread
+        self._ensure_writer()
+        self._queue.put((record, status, latency_ms, tokens_total))
+    
+    @staticmethod
+    def _encode_json(pathway, latency_ms, status, tokens_input, tokens_output,
+                     tokens_total, chunks_retrieved, error) -> bytes:
+        """One JSONL record"""
+        # Fixed schema, so the JSON line is built directly from a template
+        line = (
+            f'{{"timestamp":"{_utc_timestamp()}","pathway":{_json_str(pathway)},'
+            f'"latency_ms":{latency_ms},"status":{_json_str(status)}'
+        )
         
         if tokens_input is not None:
-            log_entry['tokens_input'] = int(tokens_input)
+            line += f',"tokens_input":{int(tokens_input)}'
         
         if tokens_output is not None:
-            log_entry['tokens_output'] = int(tokens_output)
+            line += f',"tokens_output":{int(tokens_output)}'
         
-        if tokens_input and tokens_output:
-            log_entry['tokens_total'] = int(tokens_input + tokens_output)
+        if tokens_total is not None:
+            line += f',"tokens_total":{tokens_total}'
         
         if chunks_retrieved is not None:
-            log_entry['chunks_retrieved'] = chunks_retrieved
+            line += f',"chunks_retrieved":{chunks_retrieved}'
         
         if error:
-            log_entry['error'] = str(error)
+            line += f',"error":{_json_str(str(error))}'
+        
+        line += '}\n'
+        return line.encode('utf-8')
+    
+    @staticmethod
+    def _encode_binary(pathway, latency_ms, status, tokens_input, tokens_output,
+                       chunks_retrieved, error) -> bytes:
+        """One fixed-width binary record"""
+        flags = 0
+        if tokens_input is not None:
+            flags |= FLAG_TOKENS_INPUT
+        if tokens_output is not None:
+            flags |= FLAG_TOKENS_OUTPUT
+        if chunks_retrieved is not None:
+            flags |= FLAG_CHUNKS
+        
+        return _BINARY_RECORD.pack(
+            time.time_ns(),
+            int(latency_ms),
+            int(tokens_input or 0),
+            int(tokens_output or 0),
+            int(chunks_retrieved or 0),
+            flags,
+            status.encode('utf-8'),
+            pathway.encode('utf-8'),
+            str(error).encode('utf-8') if error else b''
+        )
+    
+    def flush(self, fsync: bool = False) -> None:
+        """
+        Wait until every entry logged so far is written to the log file
+        
+        Args:
+            fsync: Also force the data to disk
+        """
+        self._ensure_writer()
+        done = threading.Event()
+        self._queue.put(done)
+        
+        # A writer that died before reaching the barrier is replaced; the
+        # new one drains the same queue and sets the event
+        while not done.wait(_FLUSH_POLL_S):
+            self._ensure_writer()
+        
+        if fsync:
+            with self._buf_lock:
+                if self._fh is not None:
+                    os.fsync(self._fh.fileno())
+    
+    def close(self) -> None:
+        """Write remaining entries, stop the writer thread and close the log file"""
+        with self._writer_lock:
+            writer = self._writer if self._writer_pid == os.getpid() else None
+            self._writer = None
+        
+        if writer is not None and writer.is_alive():
+            self._queue.put(_STOP)
+            writer.join()
+        
+        with self._buf_lock:
+            if self._unsaved:
+                self._save_agg()
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+    
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+    
+    def _flush_locked(self) -> None:
+        """Append the batch buffer in one write (caller holds _buf_lock)"""
+        if not self._buf_len:
+            return
+        
+        # Reopen if a late entry arrives after close()
+        if self._fh is None:
+            self._fh = open(self.log_file, 'ab', buffering=0)
+        
+        fd = self._fh.fileno()
+        written = self._buf_len
+        entries = self._buf_count
+        
+        # Plain writev, not io_uring: the stats bookkeeping below needs
+        # the batch in the file before returning, so a ring would submit
+        # and wait on one SQE per flush, which is no cheaper than this call.
+        # Zero-copy view of the filled part; released before the buffer
+        # is written to again
+        view = memoryview(self._buf)[:written]
+        try:
+            if hasattr(os, 'writev'):
+                self._writev(fd, [view])
+            else:
+                # Windows has no writev
+                self._fh.write(view)
+        finally:
+            view.release()
+        self._buf_len = 0
+        self._buf_count = 0
+        
+        # If the file grew by exactly this batch, no other process wrote
+        # and the buffered totals can be merged; otherwise catch up by
+        # scanning what was appended
+        pending, self._pending = self._pending, self._empty_agg()
+        if os.fstat(fd).st_size == self._agg['offset'] + written:
+            self._merge(self._agg, pending)
+            self._agg['offset'] += written
+        else:
+            self._catch_up_locked()
+        
+        self._unsaved += entries
+        if (self._unsaved >= _STATS_SAVE_ENTRIES
+                or time.monotonic() - self._saved_at >= _STATS_SAVE_INTERVAL_S):
+            self._save_agg()
+    
+    @staticmethod
+    def _writev(fd: int, bufs: List[bytes]) -> None:
+        """Write all buffers, retrying after short writes"""
+        while bufs:
+            written = os.writev(fd, bufs[:_IOV_MAX])
+            
+            # Drop fully written buffers, keep the rest of a partial one
+            i = 0
+            while i < len(bufs) and written >= len(bufs[i]):
+                written -= len(bufs[i])
+                i += 1
+            bufs = bufs[i:]
+            if written:
+                bufs[0] = memoryview(bufs[0])[written:]
+    
+    def _ensure_writer(self) -> None:
+        """Start the writer thread (again, after fork(), close() or a crash)"""
+        if self._writer_running():
+            return
         
-        # Append to log file
-        with open(self.log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        with self._writer_lock:
+            if self._writer_running():
+                return
+            
+            self._writer = threading.Thread(target=self._write_loop, args=(self._queue,), daemon=True)
+            self._writer.start()
+            self._writer_pid = os.getpid()
+    
+    def _writer_running(self) -> bool:
+        writer = self._writer
+        return self._writer_pid == os.getpid() and writer is not None and writer.is_alive()
+    
+    def _reset_after_fork(self) -> None:
+        """Replace thread state copied from the parent (its writer is gone)"""
+        self._queue = queue.SimpleQueue()
+        self._buf_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer = None
+    
+    def _write_loop(self, q: queue.SimpleQueue) -> None:
+        """Writer thread: drain the queue in batches until told to stop"""
+        while True:
+            item = q.get()
+            
+            with self._buf_lock:
+                while True:
+                    if item is _STOP:
+                        self._write_batch_locked()
+                        return
+                    
+                    if isinstance(item, threading.Event):
+                        # flush() barrier: everything queued before it
+                        self._write_batch_locked()
+                        item.set()
+                    else:
+                        self._add_entry_locked(item)
+                        if self._buf_count >= self._max_batch:
+                            self._write_batch_locked()
+                    
+                    try:
+                        item = q.get_nowait()
+                    except queue.Empty:
+                        break
+                
+                self._write_batch_locked()
+    
+    def _add_entry_locked(self, item) -> None:
+        """Append one queued entry to the batch, dropping it if it is malformed"""
+        try:
+            line, status, latency_ms, tokens_total = item
+            self._count(self._pending, status, latency_ms, tokens_total)
+        except Exception as e:
+            print(f"⚠️  Telemetry entry dropped: {e}")
+            return
+        
+        # Slice assignment past the end grows the buffer;
+        # within it, bytes are overwritten in place
+        end = self._buf_len + len(line)
+        self._buf[self._buf_len:end] = line
+        self._buf_len = end
+        self._buf_count += 1
+    
+    def _write_batch_locked(self) -> None:
+        """Flush the batch, dropping it on I/O errors so the writer survives"""
+        try:
+            self._flush_locked()
+        except Exception as e:
+            print(f"⚠️  Telemetry write failed: {e}")
+            self._buf_len = 0
+            self._buf_count = 0
+            self._pending = self._empty_agg()
     
     def get_stats(self) -> dict:
-        """Get aggregated statistics from logs"""
-        if not os.path.exists(self.log_file):
-            return {
-                'total_requests': 0,
-                'success_rate': 0,
-                'avg_latency_ms': 0,
-                'total_tokens': 0
-            }
-        
-        total = 0
-        successes = 0
+        """Get aggregated statistics from the running totals"""
+        self.flush()
+        
+        with self._buf_lock:
+            # Pick up entries appended by other processes
+            if self._file_size() != self._agg['offset']:
+                self._catch_up_locked()
+                self._save_agg()
+            
+            return self._summarize(self._agg)
+    
+    def recompute_stats(self) -> dict:
+        """
+        Rebuild the running totals from a full scan of the log
+        
+        Returns:
+            get_stats() fields, with exact rather than histogram
+            p50/p95/p99 latency over the whole log
+        """
+        self.flush()
+        
+        with self._buf_lock:
+            latencies, tokens, ok, offset = self._read_columns()
+            self._agg, (p50, p95, p99) = self._agg_from_columns(latencies, tokens, ok)
+            self._agg['offset'] = offset
+            self._save_agg()
+            stats = self._summarize(self._agg)
+        
+        stats['p50_latency_ms'] = int(p50)
+        stats['p95_latency_ms'] = int(p95)
+        stats['p99_latency_ms'] = int(p99)
+        return stats
+    
+    def _read_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Parse the whole log into the arrays _aggregate takes
+        
+        Returns:
+            (latencies, tokens, ok, offset after the last complete line)
+        """
+        if self.binary:
+            return self._read_columns_binary(0)
+        
+        if pa is not None:
+            try:
+                return self._read_columns_arrow()
+            except (pa.ArrowInvalid, OSError):
+                pass  # Malformed lines: fall back to the tolerant scan
+        
         latencies = []
         tokens = []
+        ok = []
+        offset = 0
+        for offset, entry in self._iter_entries(0):
+            if entry is None:
+                continue
+            latency_ms = _as_int(entry.get('latency_ms'))
+            tokens_total = _as_int(entry.get('tokens_total'))
+            latencies.append(-1 if latency_ms is None else latency_ms)
+            tokens.append(-1 if tokens_total is None else tokens_total)
+            ok.append(entry.get('status') == 'success')
+        
+        return (np.asarray(latencies, dtype=np.int64),
+                np.asarray(tokens, dtype=np.int64),
+                np.asarray(ok, dtype=np.uint8),
+                offset)
+    
+    def _read_columns_binary(self, start: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """Columns straight from the fixed-width records after byte offset start"""
+        records = self._read_records(start)
+        
+        both = FLAG_TOKENS_INPUT | FLAG_TOKENS_OUTPUT
+        has_tokens = (records['flags'] & both) == both
+        tokens = np.where(has_tokens,
+                          records['tokens_input'].astype(np.int64) + records['tokens_output'],
+                          -1)
+        ok = (records['status'] == b'success').astype(np.uint8)
+        
+        end = start + len(records) * _BINARY_DTYPE.itemsize
+        return records['latency_ms'].astype(np.int64), tokens, ok, end
+    
+    def _read_records(self, start: int, count: Optional[int] = None) -> np.ndarray:
+        """
+        Load complete binary records from a byte offset
+        
+        Args:
+            start: Byte offset (a multiple of the record size)
+            count: Most records to read (default: all)
+        """
+        available = max(self._file_size() - start, 0) // _BINARY_DTYPE.itemsize
+        if count is not None:
+            available = min(available, count)
+        if available == 0:
+            return np.empty(0, dtype=_BINARY_DTYPE)
+        
+        with open(self.log_file, 'rb') as f:
+            f.seek(start)
+            return np.fromfile(f, dtype=_BINARY_DTYPE, count=available)
+    
+    @staticmethod
+    def _record_to_entry(record) -> dict:
+        """Convert a binary record to the JSONL entry layout"""
+        entry = {
+            'timestamp': _format_ts(record['ts_ns']),
+            'pathway': record['pathway'].decode('utf-8', 'replace'),
+            'latency_ms': int(record['latency_ms']),
+            'status': record['status'].decode('utf-8', 'replace'),
+        }
+        
+        flags = int(record['flags'])
+        if flags & FLAG_TOKENS_INPUT:
+            entry['tokens_input'] = int(record['tokens_input'])
+        if flags & FLAG_TOKENS_OUTPUT:
+            entry['tokens_output'] = int(record['tokens_output'])
+        if flags & FLAG_TOKENS_INPUT and flags & FLAG_TOKENS_OUTPUT:
+            entry['tokens_total'] = entry['tokens_input'] + entry['tokens_output']
+        if flags & FLAG_CHUNKS:
+            entry['chunks_retrieved'] = int(record['chunks_retrieved'])
+        if record['error']:
+            # Truncation may have split a multi-byte character
+            entry['error'] = record['error'].decode('utf-8', 'ignore')
+        
+        return entry
+    
+    def to_jsonl(self, path: Optional[str] = None) -> str:
+        """
+        Export a binary log as JSONL for people and other tools
+        
+        Args:
+            path: Output file (default: telemetry.bin.jsonl next to the log,
+                so the JSONL logger's telemetry.jsonl is never overwritten)
+            
+        Returns:
+            Path written
+        """
+        if not self.binary:
+            raise ValueError("to_jsonl() converts binary logs; this log is already JSONL")
+        
+        self.flush()
+        path = path or self.log_file + '.jsonl'
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in self._read_records(0):
+                f.write(json.dumps(self._record_to_entry(record), separators=(',', ':'), ensure_ascii=False) + '\n')
+        return path
+    
+    def _read_columns_arrow(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """Columnar parse of the log with pyarrow's multithreaded JSON reader"""
+        end = self._complete_length()
+        if end == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.uint8), 0
         
-        with open(self.log_file, 'r') as f:
-            for line in f:
+        # Memory-mapped, and cut before a line another process is writing
+        with pa.memory_map(self.log_file) as source:
+            table = paj.read_json(pa.BufferReader(source.read_buffer(end)),
+                                  parse_options=_ARROW_PARSE_OPTIONS)
+        
+        latencies = pc.fill_null(table['latency_ms'], -1).to_numpy()
+        tokens = pc.fill_null(table['tokens_total'], -1).to_numpy()
+        ok = pc.fill_null(pc.equal(table['status'], 'success'), False).to_numpy()
+        return latencies, tokens, ok.astype(np.uint8), end
+    
+    def _complete_length(self) -> int:
+        """Bytes up to and including the log's last newline"""
+        if not os.path.exists(self.log_file):
+            return 0
+        
+        with open(self.log_file, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                newline = f.read(step).rfind(b'\n')
+                if newline != -1:
+                    return pos - step + newline + 1
+                pos -= step
+        return 0
+    
+    @staticmethod
+    def _summarize(agg: dict) -> dict:
+        """Turn running totals into the stats reported to callers"""
+        total = agg['total']
+        p50, p95, p99 = _hist_percentiles(agg['latency_hist'])
+        return {
+            'total_requests': total,
+            'success_rate': (agg['successes'] / total * 100) if total > 0 else 0,
+            'avg_latency_ms': agg['sum_latency'] // agg['n_latency'] if agg['n_latency'] else 0,
+            'p50_latency_ms': p50,
+            'p95_latency_ms': p95,
+            'p99_latency_ms': p99,
+            'total_tokens': agg['sum_tokens'],
+            'avg_tokens_per_request': agg['sum_tokens'] // agg['n_tokens'] if agg['n_tokens'] else 0
+        }
+    
+    @staticmethod
+    def _agg_from_columns(latencies: np.ndarray, tokens: np.ndarray, ok: np.ndarray) -> Tuple[dict, tuple]:
+        """
+        Aggregate parsed columns in one pass
+        
+        Returns:
+            (aggregate with offset 0, exact (p50, p95, p99) latency)
+        """
+        successes, sum_latency, n_latency, sum_tokens, n_tokens, p50, p95, p99 = _aggregate(
+            latencies, tokens, ok
+        )
+        hist = np.bincount(_hist_indices(latencies[latencies >= 0]), minlength=_HIST_BUCKETS)
+        
+        agg = {
+            'total': len(latencies),
+            'successes': int(successes),
+            'sum_latency': int(sum_latency),
+            'n_latency': int(n_latency),
+            'sum_tokens': int(sum_tokens),
+            'n_tokens': int(n_tokens),
+            'latency_hist': hist.tolist(),
+            'offset': 0
+        }
+        return agg, (p50, p95, p99)
+    
+    def _catch_up_locked(self) -> None:
+        """Add entries after the aggregate's offset (caller holds _buf_lock)"""
+        # Log truncated or rotated: start over
+        if self._file_size() < self._agg['offset']:
+            self._agg = self._empty_agg()
+        
+        if self.binary:
+            latencies, tokens, ok, end = self._read_columns_binary(self._agg['offset'])
+            self._merge(self._agg, self._agg_from_columns(latencies, tokens, ok)[0])
+            self._agg['offset'] = end
+            return
+        
+        for offset, entry in self._iter_entries(self._agg['offset']):
+            self._agg['offset'] = offset
+            if entry is not None:
+                # Values that aren't numbers count as absent
+                self._count(self._agg, entry.get('status'),
+                            _as_int(entry.get('latency_ms')), _as_int(entry.get('tokens_total')))
+    
+    def _iter_entries(self, start: int) -> Iterator[Tuple[int, Optional[dict]]]:
+        """
+        Parse complete log lines from a byte offset
+        
+        Yields:
+            (offset after the line, parsed entry or None if malformed)
+        """
+        mm = self._map_log()
+        if mm is None:
+            return
+        
+        try:
+            offset = start
+            while True:
+                # Stop at a line another process is still writing
+                end = mm.find(b'\n', offset)
+                if end < 0:
+                    break
+                line = mm[offset:end]
+                offset = end + 1
+                
                 try:
-                    entry = json.loads(line)
-                    total += 1
-                    
-                    if entry.get('status') == 'success':
-                        successes += 1
-                    
-                    if 'latency_ms' in entry:
-                        latencies.append(entry['latency_ms'])
-                    
-                    if 'tokens_total' in entry:
-                        tokens.append(entry['tokens_total'])
-                        
+                    yield offset, _loads(line)
                 except json.JSONDecodeError:
-                    continue
+                    yield offset, None
+        finally:
+            mm.close()
+    
+    def _map_log(self) -> Optional[mmap.mmap]:
+        """Read-only map of the log file, or None if it is missing or empty"""
+        try:
+            with open(self.log_file, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+    
+    @staticmethod
+    def _count(agg: dict, status: Optional[str], latency_ms: Optional[int], tokens_total: Optional[int]) -> None:
+        """Add one log entry to a running aggregate (None = field absent)"""
+        # Convert first so a bad value leaves the aggregate untouched
+        if latency_ms is not None:
+            latency_ms = int(latency_ms)
+            bucket = _hist_index(latency_ms)
+        if tokens_total is not None:
+            tokens_total = int(tokens_total)
+        
+        agg['total'] += 1
+        
+        if status == 'success':
+            agg['successes'] += 1
         
+        if latency_ms is not None:
+            agg['sum_latency'] += latency_ms
+            agg['n_latency'] += 1
+            agg['latency_hist'][bucket] += 1
+        
+        if tokens_total is not None:
+            agg['sum_tokens'] += tokens_total
+            agg['n_tokens'] += 1
+    
+    @staticmethod
+    def _merge(agg: dict, other: dict) -> None:
+        """Add another aggregate's counts into agg (offsets are left alone)"""
+        for key, value in other.items():
+            if key == 'latency_hist':
+                hist = agg['latency_hist']
+                for i, count in enumerate(value):
+                    if count:
+                        hist[i] += count
+            elif key != 'offset':
+                agg[key] += value
+    
+    @staticmethod
+    def _empty_agg() -> dict:
         return {
-            'total_requests': total,
-            'success_rate': (successes / total * 100) if total > 0 else 0,
-            'avg_latency_ms': sum(latencies) // len(latencies) if latencies else 0,
-            'total_tokens': sum(tokens),
-            'avg_tokens_per_request': sum(tokens) // len(tokens) if tokens else 0
+            'total': 0,
+            'successes': 0,
+            'sum_latency': 0,
+            'n_latency': 0,
+            'sum_tokens': 0,
+            'n_tokens': 0,
+            'latency_hist': [0] * _HIST_BUCKETS,
+            'offset': 0
         }
     
+    def _load_agg(self) -> dict:
+        """Read the sidecar, or start empty (get_stats scans to catch up)"""
+        agg = self._empty_agg()
+        try:
+            with open(self.stats_file, 'r') as f:
+                saved = json.load(f)
+            # Sidecars from older versions or another bucket layout are
+            # dropped; the first get_stats() rebuilds them from the log
+            if set(saved) == set(agg) and len(saved['latency_hist']) == _HIST_BUCKETS:
+                agg = saved
+        except (OSError, ValueError):
+            pass
+        return agg
+    
+    def _save_agg(self) -> None:
+        """Atomically replace the sidecar with the current totals"""
+        tmp = f"{self.stats_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self._agg, f)
+        os.replace(tmp, self.stats_file)
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+    
+    def _file_size(self) -> int:
+        try:
+            return os.path.getsize(self.log_file)
+        except OSError:
+            return 0
+    
     def print_stats(self) -> None:
         """Print formatted statistics"""
         stats = self.get_stats()
@@ -116,26 +937,37 @@ class TelemetryLogger:
         print(f"Total Requests:       {stats['total_requests']}")
         print(f"Success Rate:         {stats['success_rate']:.1f}%")
         print(f"Avg Latency:          {stats['avg_latency_ms']}ms")
+        print(f"Latency p50/p95/p99:  {stats['p50_latency_ms']}/{stats['p95_latency_ms']}/{stats['p99_latency_ms']}ms")
         print(f"Total Tokens:         {stats['total_tokens']}")
         print(f"Avg Tokens/Request:   {stats['avg_tokens_per_request']}")
         print("="*60 + "\n")
     
     def tail_logs(self, n: int = 10) -> None:
         """Print last n log entries"""
+        self.flush()
+        
         if not os.path.exists(self.log_file):
             print("No logs yet.")
             return
         
-        with open(self.log_file, 'r') as f:
-            lines = f.readlines()
+        if self.binary:
+            count = self._file_size() // _BINARY_DTYPE.itemsize
+            start = max(count - n, 0) * _BINARY_DTYPE.itemsize
+            entries = [self._record_to_entry(record) for record in self._read_records(start, n)]
+        else:
+            entries = []
+            for line in self._read_tail(n):
+                try:
+                    entries.append(_loads(line))
+                except json.JSONDecodeError:
+                    continue
         
         print(f"\n{'='*80}")
-        print(f"LAST {min(n, len(lines))} LOG ENTRIES")
+        print(f"LAST {min(n, len(entries))} LOG ENTRIES")
         print('='*80)
         
-        for line in lines[-n:]:
+        for entry in entries:
             try:
-                entry = json.loads(line)
                 timestamp = entry['timestamp'][:19].replace('T', ' ')
                 pathway = entry['pathway'].ljust(10)
                 status = entry['status'].ljust(7)
@@ -151,10 +983,37 @@ class TelemetryLogger:
                 
                 print(line_str)
                 
-            except json.JSONDecodeError:
+            except KeyError:
                 continue
         
         print('='*80 + "\n")
+    
+    def _read_tail(self, n: int) -> List[bytes]:
+        """Read the last n lines by seeking backwards from the end"""
+        if n <= 0:
+            return []
+        
+        mm = self._map_log()
+        if mm is None:
+            return []
+        
+        try:
+            end = len(mm)
+            # Skip the newline ending the last line
+            pos = end - 1 if mm[end - 1] == ord('\n') else end
+            
+            # The newline before each of the last n lines marks where it starts
+            start = 0
+            for _ in range(n):
+                pos = mm.rfind(b'\n', 0, pos)
+                if pos < 0:
+                    start = 0
+                    break
+                start = pos + 1
+            
+            return mm[start:end].splitlines()
+        finally:
+            mm.close()
 
 
 if __name__ == '__main__':
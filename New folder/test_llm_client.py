@@ -0,0 +1,73 @@
+import json
+import pytest
+
+from llm_client import QuestionStreamParser
+
+
+QUESTIONS = [
+    {"question": "Why do leaves look green?", "hint": "Think about \"reflected\" light", "rubric": "Mentions chlorophyll"},
+    {"question": "What does [CO2] become?", "hint": "A sugar {C6H12O6}", "rubric": "Glucose \\ sugar"},
+    {"question": "Name the stages", "hint": "Two of them", "rubric": "Light reactions, Calvin cycle"},
+]
+TEXT = 'Here are your questions:\n' + json.dumps(QUESTIONS, indent=2) + '\nGood luck!'
+
+
+def _feed_all(fragments):
+    parser = QuestionStreamParser()
+    found = []
+    for fragment in fragments:
+        found.extend(parser.feed(fragment))
+    return parser, found
+
+
+def test_whole_response():
+    parser, found = _feed_all([TEXT])
+    assert parser.started and parser.closed
+    assert found == QUESTIONS
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64])
+def test_any_fragment_boundary(size):
+    # Splits land inside strings, between a backslash and what it escapes,
+    # and between braces
+    _, found = _feed_all([TEXT[i:i + size] for i in range(0, len(TEXT), size)])
+    assert found == QUESTIONS
+
+
+def test_split_after_backslash():
+    text = '[{"question": "a \\"quoted\\" ]} word", "hint": "h", "rubric": "r"}]'
+    cut = text.index('\\"') + 1
+    _, found = _feed_all([text[:cut], text[cut:]])
+    assert found == [{"question": 'a "quoted" ]} word', "hint": "h", "rubric": "r"}]
+
+
+def test_escaped_backslash_ends_string():
+    # \\ is a literal backslash, so the quote after it closes the string
+    text = '[{"question": "path C:\\\\", "hint": "h", "rubric": "r"}]'
+    _, found = _feed_all([text[i:i + 1] for i in range(len(text))])
+    assert found == [{"question": "path C:\\", "hint": "h", "rubric": "r"}]
+
+
+def test_questions_emitted_as_completed():
+    parser = QuestionStreamParser()
+    first_end = TEXT.index('},') + 1
+    assert parser.feed(TEXT[:first_end]) == [QUESTIONS[0]]
+    assert parser.feed(TEXT[first_end:]) == QUESTIONS[1:]
+
+
+def test_malformed_question_skipped():
+    text = '[{"question": "ok", "hint": "h", "rubric": "r"}, {"question": oops}, {"question": "next", "hint": "h", "rubric": "r"}]'
+    _, found = _feed_all([text])
+    assert [q['question'] for q in found] == ['ok', 'next']
+
+
+def test_text_after_array_ignored():
+    parser, found = _feed_all(['[{"a": 1}]', ' and [{"b": 2}]'])
+    assert parser.closed
+    assert found == [{"a": 1}]
+
+
+def test_no_array():
+    parser, found = _feed_all(['Sorry, I cannot help with that.'])
+    assert not parser.started
+    assert found == []
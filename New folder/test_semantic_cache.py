@@ -0,0 +1,59 @@
+import numpy as np
+
+from semantic_cache import SemanticCache
+
+
+def _unit(i, dim=8):
+    vec = np.zeros(dim, dtype=np.float32)
+    vec[i] = 1.0
+    return vec
+
+
+def test_hit_and_miss():
+    cache = SemanticCache(threshold=0.95)
+    assert cache.get(_unit(0)) is None
+    
+    cache.put(_unit(0), 'quiz')
+    near = _unit(0) + 0.05 * _unit(1)
+    assert cache.get(near) == 'quiz'
+    assert cache.get(_unit(1)) is None
+
+
+def test_namespaces_do_not_match():
+    cache = SemanticCache()
+    cache.put(_unit(0), 'easy quiz', namespace=('easy', 3))
+    cache.put(_unit(0), 'hard quiz', namespace=('hard', 3))
+    
+    assert cache.get(_unit(0), namespace=('easy', 3)) == 'easy quiz'
+    assert cache.get(_unit(0), namespace=('hard', 3)) == 'hard quiz'
+    assert cache.get(_unit(0), namespace=('medium', 3)) is None
+    assert cache.get(_unit(0)) is None
+
+
+def test_best_match_wins():
+    cache = SemanticCache(threshold=0.9)
+    cache.put(_unit(0) + 0.3 * _unit(1), 'farther')
+    cache.put(_unit(0) + 0.1 * _unit(1), 'closer')
+    assert cache.get(_unit(0)) == 'closer'
+
+
+def test_fifo_eviction():
+    cache = SemanticCache(max_entries=3)
+    for i in range(5):
+        cache.put(_unit(i), f'quiz {i}')
+    
+    assert len(cache) == 3
+    assert cache.matrix.shape == (3, 8)
+    assert cache.get(_unit(0)) is None
+    assert cache.get(_unit(1)) is None
+    for i in range(2, 5):
+        # Rows stay aligned with their responses after eviction
+        assert cache.get(_unit(i)) == f'quiz {i}'
+
+
+def test_clear():
+    cache = SemanticCache()
+    cache.put(_unit(0), 'quiz')
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get(_unit(0)) is None
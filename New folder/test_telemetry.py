@@ -0,0 +1,112 @@
+import os
+import pytest
+
+from telemetry import TelemetryLogger
+
+
+def _log_sample(logger):
+    logger.log('RAG', 120, 'success', tokens_input=300, tokens_output=100, chunks_retrieved=3)
+    logger.log('cache', 4.7, 'success')
+    logger.log('RAG', 900, 'error', error='Ollama timed out')
+
+
+@pytest.mark.parametrize('record_format', ['jsonl', 'binary'])
+def test_round_trip(tmp_path, capsys, record_format):
+    logger = TelemetryLogger(log_dir=str(tmp_path), record_format=record_format)
+    _log_sample(logger)
+    
+    stats = logger.get_stats()
+    assert stats['total_requests'] == 3
+    assert stats['success_rate'] == pytest.approx(200 / 3)
+    assert stats['avg_latency_ms'] == (120 + 4 + 900) // 3
+    assert stats['total_tokens'] == 400
+    assert stats['avg_tokens_per_request'] == 400
+    
+    # A full scan agrees with the running totals
+    full = logger.recompute_stats()
+    for field in ('total_requests', 'success_rate', 'avg_latency_ms',
+                  'total_tokens', 'avg_tokens_per_request'):
+        assert full[field] == stats[field]
+    assert full['p50_latency_ms'] == 120
+    
+    capsys.readouterr()
+    logger.tail_logs(2)
+    out = capsys.readouterr().out
+    assert 'LAST 2 LOG ENTRIES' in out
+    assert '| cache' in out
+    assert 'ERROR: Ollama timed out' in out
+    assert '400 tokens' not in out
+    
+    logger.close()
+
+
+@pytest.mark.parametrize('record_format', ['jsonl', 'binary'])
+def test_stats_survive_reopen(tmp_path, record_format):
+    logger = TelemetryLogger(log_dir=str(tmp_path), record_format=record_format)
+    _log_sample(logger)
+    logger.get_stats()
+    logger.close()
+    
+    reopened = TelemetryLogger(log_dir=str(tmp_path), record_format=record_format)
+    reopened.log('RAG', 50, 'success', tokens_input=0, tokens_output=0)
+    stats = reopened.get_stats()
+    assert stats['total_requests'] == 4
+    assert stats['total_tokens'] == 400
+    assert reopened.recompute_stats()['total_requests'] == 4
+    reopened.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork()")
+@pytest.mark.parametrize('record_format', ['jsonl', 'binary'])
+def test_forked_writers(tmp_path, record_format):
+    logger = TelemetryLogger(log_dir=str(tmp_path), record_format=record_format)
+    
+    # Still queued at fork(); must be written once, not once per process
+    for _ in range(10):
+        logger.log('RAG', 10, 'success')
+    
+    children = []
+    for _ in range(3):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                for _ in range(50):
+                    logger.log('RAG', 20, 'success', tokens_input=1, tokens_output=1)
+                logger.flush()
+                code = 0
+            finally:
+                os._exit(code)
+        children.append(pid)
+    
+    for _ in range(5):
+        logger.log('RAG', 30, 'error', error='parent')
+    
+    for pid in children:
+        _, status = os.waitpid(pid, 0)
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    
+    stats = logger.get_stats()
+    assert stats['total_requests'] == 10 + 3 * 50 + 5
+    assert stats['total_tokens'] == 3 * 50 * 2
+    assert logger.recompute_stats()['total_requests'] == stats['total_requests']
+    logger.close()
+
+
+def test_binary_to_jsonl(tmp_path):
+    logger = TelemetryLogger(log_dir=str(tmp_path), record_format='binary')
+    _log_sample(logger)
+    
+    path = logger.to_jsonl()
+    assert path == logger.log_file + '.jsonl'
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3
+    assert '"tokens_total":400' in lines[0]
+    assert '"error":"Ollama timed out"' in lines[2]
+    logger.close()
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        TelemetryLogger(log_dir=str(tmp_path), record_format='csv')